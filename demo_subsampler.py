@@ -0,0 +1,137 @@
+"""
+Redundancy-aware subsampling of recorded demo data.
+
+Demos are recorded every frame, so at 60 fps consecutive observations are
+nearly identical and usually carry the same action. This collapses each run of
+near-duplicate consecutive (observation, action) frames into its first frame
+with a 'weight' equal to the run length. Every frame whose action differs
+from the previous frame starts a new run and is therefore always kept.
+train_behavioral_cloning() uses the weights in a weighted cross-entropy, so
+the objective matches training on the full recording.
+
+Compact a demo file on disk:
+    python demo_subsampler.py asteroid_droid_demo.json asteroid_droid_demo_compact.json
+"""
+
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def find_run_starts(observations: np.ndarray, actions: np.ndarray, method: str = 'distance',
+                    tolerance: float = 0.02, max_run_length: int = 60,
+                    dones: Optional[np.ndarray] = None) -> np.ndarray:
+    """Boolean mask of frames that start a new run.
+
+    Args:
+        observations: (N, obs_dim) array of consecutive frames
+        actions: (N,) actions
+        method: 'distance' - a run continues while frames stay within L-inf
+            distance tolerance of the run's first frame (one vectorized distance
+            computation per run); 'quantize' - a run continues while frames hash
+            to the same grid cell of size tolerance (fully vectorized, but breaks
+            runs more often when many dimensions drift)
+        tolerance: Distance threshold or grid cell size
+        max_run_length: Upper bound on frames collapsed into one sample (0 = no limit)
+        dones: Optional episode-end flags; the frame after a done starts a new run
+    """
+    if method not in ('quantize', 'distance'):
+        raise ValueError(f"Unknown subsampling method '{method}' (expected 'quantize' or 'distance')")
+
+    num_frames = len(observations)
+    starts = np.ones(num_frames, dtype=bool)
+    if num_frames < 2:
+        return starts
+
+    # Action changes and episode boundaries always start a new run
+    starts[1:] = actions[1:] != actions[:-1]
+    if dones is not None:
+        starts[1:] |= dones[:-1].astype(bool)
+
+    if method == 'quantize':
+        cells = np.floor(observations / tolerance).astype(np.int64)
+        starts[1:] |= np.any(cells[1:] != cells[:-1], axis=1)
+    else:
+        forced = np.append(np.flatnonzero(starts), num_frames)
+        window_limit = max_run_length if max_run_length > 0 else 256
+        i = 0
+        while i < num_frames:
+            starts[i] = True
+            run_end = forced[np.searchsorted(forced, i, side='right')]
+            if max_run_length > 0:
+                run_end = min(run_end, i + max_run_length)
+            # Scan forward in bounded windows for the first frame too far from the anchor
+            j = i + 1
+            while j < run_end:
+                window_end = min(run_end, j + window_limit)
+                distances = np.max(np.abs(observations[j:window_end] - observations[i]), axis=1)
+                far = np.flatnonzero(distances > tolerance)
+                if len(far):
+                    run_end = j + far[0]
+                    break
+                j = window_end
+            i = run_end
+        return starts
+
+    if max_run_length > 0:
+        # Position of each frame within its run; split runs every max_run_length frames
+        start_indices = np.flatnonzero(starts)
+        run_ids = np.cumsum(starts) - 1
+        positions = np.arange(num_frames) - start_indices[run_ids]
+        starts |= (positions % max_run_length) == 0
+
+    return starts
+
+
+def subsample_demo_data(demo_data: List[Dict], **kwargs) -> List[Dict]:
+    """Subsample a list of demo frames (as returned by load_demo_data).
+
+    Kept frames carry a 'weight' equal to the number of frames they stand for.
+    """
+    if not demo_data:
+        return demo_data
+
+    observations = np.array([d['observation'] for d in demo_data], dtype=np.float32)
+    actions = np.array([d['action'] for d in demo_data])
+    weights = np.array([d.get('weight', 1.0) for d in demo_data], dtype=np.float32)
+    dones = np.array([d.get('done', False) for d in demo_data], dtype=bool)
+
+    starts = find_run_starts(observations, actions, dones=dones, **kwargs)
+    run_ids = np.cumsum(starts) - 1
+    run_weights = np.bincount(run_ids, weights=weights)
+    # A done frame always ends its run, so the run inherits the flag
+    run_dones = np.bincount(run_ids, weights=dones) > 0
+
+    subsampled = []
+    for run_id, index in enumerate(np.flatnonzero(starts)):
+        frame = dict(demo_data[index])
+        frame['weight'] = float(run_weights[run_id])
+        if run_dones[run_id]:
+            frame['done'] = True
+        subsampled.append(frame)
+    return subsampled
+
+
+def main():
+    from train_asteroid_droid import load_demo_data, save_demo_data
+
+    parser = argparse.ArgumentParser(description='Collapse near-duplicate consecutive demo frames')
+    parser.add_argument('input', type=str, help='Demo data JSON file')
+    parser.add_argument('output', type=str, help='Output JSON file')
+    parser.add_argument('--method', type=str, default='distance', choices=['distance', 'quantize'],
+                        help='Near-duplicate test (default: distance)')
+    parser.add_argument('--tolerance', type=float, default=0.02, help='Distance threshold or grid cell size (default: 0.02)')
+    parser.add_argument('--max_run_length', type=int, default=60, help='Max frames per collapsed sample, 0 = no limit (default: 60)')
+    args = parser.parse_args()
+
+    demo_data = load_demo_data(args.input)
+    subsampled = subsample_demo_data(demo_data, method=args.method, tolerance=args.tolerance,
+                                     max_run_length=args.max_run_length)
+    print(f"Subsampled {len(demo_data)} frames to {len(subsampled)} "
+          f"({len(demo_data) / max(len(subsampled), 1):.1f}x reduction)")
+    save_demo_data(subsampled, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -24,6 +24,7 @@ const OFFLINE_MODE = urlParams.get('offline') === '1';
 const HEADLESS_MODE = urlParams.get('headless') === '1';
 const OBSERVER_MODE = urlParams.get('observe') === '1';
 const SPEED_MULTIPLIER = OFFLINE_MODE && HEADLESS_MODE ? parseFloat(urlParams.get('speed') || '5') : 1;
+const LEARNER_URL = OFFLINE_MODE ? urlParams.get('learner') : null;  // e.g. ws://localhost:8765 (learner_service.py)
 
 // Deterministic RNG for lockstep multiplayer
 class DeterministicRNG {
@@ -463,6 +464,7 @@ let mobileRotateRight = false;
 // RL Agent / Autopilot System
 let autopilotEnabled = false;
 let rlAgent = null;  // Will hold RL agent (PPO)
+let learnerClient = null;  // Set when acting for a remote learner (?learner=ws://...)
 let agentLoadPromise = null;
 
 // Training statistics
@@ -3280,9 +3282,13 @@ function deactivateTractorBeam() {
 // RL Agent / Autopilot Functions
 
 // Observation and action dimensions
+// Layout is mirrored by observation_schema.py for Python training - keep both in sync
 // Updated: 6 (player) + 15 (enemies) + 10 (asteroids) + 10 (enemy bullets) + 5 (weapons) + 2 (tractor) + 2 (score/level) + 4 (cargo) + 4 (crew) + 1 (upgrade pending) + 4 (powerups) = 63
 const OBS_DIM = 63;
 const NUM_ACTIONS = 20;  // 0-19 actions (11 movement/combat + 5 crew management + 4 upgrade selection)
+// Must equal observation_schema.SCHEMA_HASH (python -c "from observation_schema import SCHEMA_HASH; print(SCHEMA_HASH)").
+// Reordering fields keeps OBS_DIM unchanged, so only the hash catches it - update both together.
+const OBS_SCHEMA_HASH = '2b460f3bf9d59856';
 
 // Action space: 16 discrete actions
 const ACTIONS = {
@@ -3757,8 +3763,9 @@ async function autopilotStep() {
         let result;
         if (rlAgent instanceof PPOAgent) {
             // Small exploration chance keeps training progressing while mostly deterministic for a smooth autopilot
+            // Remote-learner actors always sample so the logged logProb is the true behaviour probability
             const exploreChance = 0.05;
-            const deterministic = !(Math.random() < exploreChance);
+            const deterministic = !learnerClient && !(Math.random() < exploreChance);
             result = await rlAgent.getAction(observation, deterministic);
             console.log('Autopilot action:', result.action, 'Observation (first 5):', observation.slice(0, 5), 'deterministic:', deterministic);
             applyAgentAction(result.action);
@@ -3794,6 +3801,9 @@ async function autopilotStep() {
                     lastLogProb,
                     done
                 );
+                if (learnerClient) {
+                    learnerClient.maybeFlush();
+                }
             }
         }
         
@@ -4407,6 +4417,17 @@ class PPOAgent {
         };
     }
     
+    clearBuffer() {
+        this.buffer = {
+            observations: [],
+            actions: [],
+            rewards: [],
+            values: [],
+            logProbs: [],
+            dones: []
+        };
+    }
+    
     storeExperience(obs, action, reward, value, logProb, done) {
         this.buffer.observations.push(obs);
         this.buffer.actions.push(action);
@@ -4580,14 +4601,7 @@ class PPOAgent {
         oldValueTensor.dispose();
         
         // Clear buffer
-        this.buffer = {
-            observations: [],
-            actions: [],
-            rewards: [],
-            values: [],
-            logProbs: [],
-            dones: []
-        };
+        this.clearBuffer();
         
         return {
             policyLoss: totalPolicyLoss / epochs,
@@ -4740,6 +4754,10 @@ async function exportModelWeights(extraMetadata = {}) {
     
     return {
         weights: weightsData,
+        weights_layout: 'tfjs',  // dense kernels [in, out] (see weight_layout.py)
+        schema_hash: OBS_SCHEMA_HASH,
+        obs_dim: OBS_DIM,
+        action_dim: NUM_ACTIONS,
         episode: trainingStats.episode,
         bestScore: trainingStats.bestScore,
         exportedAt: Date.now(),
@@ -4837,6 +4855,9 @@ async function handleEpisodeEnd() {
             lastLogProb,
             true  // Episode done
         );
+        if (learnerClient) {
+            learnerClient.flush();
+        }
     }
     
     // Update training stats
@@ -4913,6 +4934,12 @@ function startNewEpisode() {
 async function performTrainingUpdate() {
     if (!rlAgent || !(rlAgent instanceof PPOAgent)) return;
     
+    // Acting for a remote learner: ship experience instead of training in the page
+    if (learnerClient) {
+        learnerClient.flush();
+        return;
+    }
+    
     console.log(`Training update at episode ${trainingStats.episode}...`);
     
     try {
@@ -4970,10 +4997,103 @@ function getTrainingStatsSnapshot() {
         bestScore: trainingStats.bestScore,
         avgReward,
         totalReward: trainingStats.totalReward,
-        lastScore
+        lastScore,
+        policyVersion: learnerClient ? learnerClient.policyVersion : null
     };
 }
 
+// Actor client for learner_service.py (?offline=1&headless=1&learner=ws://localhost:8765)
+// The page only plays: experience is streamed to the Python learner in segments and
+// the versioned weights it broadcasts are loaded into the local policy network.
+const LEARNER_SEGMENT_LENGTH = 256;
+
+class LearnerClient {
+    constructor(url, actorId = `browser-${Math.random().toString(36).slice(2, 8)}`) {
+        this.url = url;
+        this.actorId = actorId;
+        this.socket = null;
+        this.policyVersion = -1;
+        this.segmentVersion = -1;  // Oldest policy version that produced the buffered steps
+        this.pendingWeights = null;
+        this.loadingWeights = false;
+    }
+    
+    connect() {
+        this.socket = new WebSocket(this.url);
+        this.socket.onopen = () => {
+            console.log(`[learner] Connected to ${this.url} as ${this.actorId}`);
+            this.socket.send(JSON.stringify({
+                type: 'hello',
+                actor_id: this.actorId,
+                schema_hash: OBS_SCHEMA_HASH,
+                obs_dim: OBS_DIM,
+                action_dim: NUM_ACTIONS
+            }));
+        };
+        this.socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'weights') {
+                if (message.schema_hash && message.schema_hash !== OBS_SCHEMA_HASH) {
+                    console.error(`[learner] Ignoring weights for observation schema ${message.schema_hash}, game uses ${OBS_SCHEMA_HASH}`);
+                    return;
+                }
+                // Only the newest weights matter if several arrive while one is loading
+                this.pendingWeights = message;
+                this.applyPendingWeights();
+            }
+        };
+        this.socket.onclose = (event) => {
+            console.warn(`[learner] Connection closed (${event.code} ${event.reason}), retrying in 2s`);
+            setTimeout(() => this.connect(), 2000);
+        };
+    }
+    
+    async applyPendingWeights() {
+        if (this.loadingWeights || !this.pendingWeights || !(rlAgent instanceof PPOAgent)) return;
+        this.loadingWeights = true;
+        try {
+            while (this.pendingWeights) {
+                const message = this.pendingWeights;
+                this.pendingWeights = null;
+                await rlAgent.loadModel({ weights: message.weights });
+                this.policyVersion = message.version;
+                if (rlAgent.buffer.observations.length === 0) {
+                    this.segmentVersion = this.policyVersion;
+                }
+            }
+        } catch (error) {
+            console.error('[learner] Failed to load weights:', error);
+        } finally {
+            this.loadingWeights = false;
+        }
+    }
+    
+    maybeFlush() {
+        if (rlAgent.buffer.observations.length >= LEARNER_SEGMENT_LENGTH) {
+            this.flush();
+        }
+    }
+    
+    flush() {
+        const buffer = rlAgent.buffer;
+        if (buffer.observations.length < 2 || !this.socket || this.socket.readyState !== WebSocket.OPEN) {
+            return;
+        }
+        this.socket.send(JSON.stringify({
+            type: 'trajectory',
+            actor_id: this.actorId,
+            policy_version: this.segmentVersion,
+            observations: buffer.observations,
+            actions: buffer.actions,
+            rewards: buffer.rewards,
+            log_probs: buffer.logProbs,
+            dones: buffer.dones
+        }));
+        rlAgent.clearBuffer();
+        this.segmentVersion = this.policyVersion;
+    }
+}
+
 function setupOfflineAPI() {
     if (!OFFLINE_MODE || window.offlineAPIReady) return;
     
@@ -10857,6 +10977,10 @@ document.addEventListener('DOMContentLoaded', async () => {
             updateAutopilotUI();
             startNewEpisode();
             setupOfflineAPI();
+            if (LEARNER_URL) {
+                learnerClient = new LearnerClient(LEARNER_URL, urlParams.get('actor') || undefined);
+                learnerClient.connect();
+            }
         } else {
             showMissionBriefing();
         }
@@ -0,0 +1,398 @@
+"""
+Centralized learner service for Asteroid Droid.
+
+Many actor clients (headless browser pages started by offline_training.js with
+?learner=ws://..., or scripted_actor.py for testing) connect over a local
+WebSocket, stream trajectory segments and receive versioned policy weights.
+The learner batches incoming experience and updates the Python PolicyNetwork
+with V-trace off-policy correction, so segments collected by actors running an
+older policy version still produce unbiased updates. Gameplay never blocks on
+training and throughput grows with the number of actors.
+
+Protocol (JSON text messages):
+    actor -> learner  {"type": "hello", "actor_id", "schema_hash", "obs_dim", "action_dim"}
+    learner -> actor  {"type": "weights", "version", "weights", ...schema}
+    actor -> learner  {"type": "trajectory", "policy_version", "observations",
+                       "actions", "rewards", "log_probs", "dones"}
+    actor -> learner  {"type": "get_weights", "have_version"}
+    learner -> actor  {"type": "stats", ...}  (reply to {"type": "get_stats"})
+
+Weights are sent in TensorFlow.js layout (dense kernels are [in, out]), the
+same layout game.js PPOAgent.loadModel() consumes. Saved learner models record
+this as 'weights_layout': 'tfjs' so load_model_from_json() can read them back.
+Malformed messages are logged and dropped without closing the connection.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+import torch.optim as optim
+
+from observation_schema import OBS_SCHEMA, OBS_DIM, NUM_ACTIONS, SchemaMismatchError
+from pretrain_asteroid_droid import PolicyNetwork, load_model_from_json
+from weight_layout import state_dict_to_tfjs_weights
+
+def vtrace_targets(log_rhos: np.ndarray, rewards: np.ndarray, discounts: np.ndarray,
+                   values: np.ndarray, bootstrap_value: float,
+                   rho_bar: float = 1.0, c_bar: float = 1.0):
+    """V-trace value targets and policy-gradient advantages for one segment.
+
+    Args:
+        log_rhos: log(pi(a|x) / mu(a|x)) per step (learner vs. behaviour policy)
+        rewards: Reward per step
+        discounts: gamma * (1 - done) per step
+        values: Learner value estimates V(x_t)
+        bootstrap_value: V(x_T) for the state after the last step
+
+    Returns:
+        (vs, pg_advantages), both shaped like rewards
+    """
+    rhos = np.exp(log_rhos)
+    clipped_rhos = np.minimum(rho_bar, rhos)
+    cs = np.minimum(c_bar, rhos)
+    values_tp1 = np.append(values[1:], bootstrap_value)
+    deltas = clipped_rhos * (rewards + discounts * values_tp1 - values)
+
+    vs_minus_v = np.zeros_like(values)
+    acc = 0.0
+    for t in reversed(range(len(rewards))):
+        acc = deltas[t] + discounts[t] * cs[t] * acc
+        vs_minus_v[t] = acc
+    vs = values + vs_minus_v
+
+    vs_tp1 = np.append(vs[1:], bootstrap_value)
+    pg_advantages = clipped_rhos * (rewards + discounts * vs_tp1 - values)
+    return vs, pg_advantages
+
+
+class Learner:
+    """Owns the policy network and turns queued actor segments into updates."""
+
+    def __init__(self, lr: float = 3e-4, gamma: float = 0.99, batch_steps: int = 2048,
+                 max_policy_lag: int = 20, entropy_coef: float = 0.01, value_coef: float = 0.5,
+                 device: str = "cpu"):
+        self.device = torch.device(device)
+        self.gamma = gamma
+        self.batch_steps = batch_steps
+        self.max_policy_lag = max_policy_lag
+        self.entropy_coef = entropy_coef
+        self.value_coef = value_coef
+
+        self.model = PolicyNetwork(OBS_DIM, NUM_ACTIONS).to(self.device)
+        self.optimizer = optim.Adam(self.model.parameters(), lr=lr)
+        self.version = 0
+        self.schema_migrations: List[Dict] = []  # Layout changes the initial weights went through
+        self.lock = threading.Lock()
+
+        self.segments: List[Dict[str, np.ndarray]] = []
+        self.queued_steps = 0
+        self.stats = {'segments_received': 0, 'steps_received': 0, 'segments_dropped': 0,
+                      'updates': 0, 'last_losses': {}}
+        self.published_weights = None
+        self._publish_weights()
+
+    def load_initial_weights(self, json_file: str):
+        """Start from a pretrain_asteroid_droid.py export, a game.js export or a previous learner output.
+
+        Raises ValueError (SchemaMismatchError for a layout mismatch) if the file
+        has no usable weights for the current network.
+        """
+        state_dict, data = load_model_from_json(json_file)
+        if not state_dict:
+            raise ValueError(f"No usable weights in {json_file}")
+        try:
+            self.model.load_state_dict(state_dict)
+        except RuntimeError as e:
+            raise ValueError(f"Weights in {json_file} do not fit the policy network: {e}") from e
+        self.version = data.get('learner_version', 0)
+        self.schema_migrations = data.get('schema_migrations', [])
+        self._publish_weights()
+        print(f"✅ Learner initialized from {json_file} (version {self.version})")
+
+    def add_segment(self, message: Dict) -> int:
+        """Validate and queue a trajectory segment from an actor. Returns its length."""
+        observations = np.asarray(message['observations'], dtype=np.float32)
+        if observations.ndim != 2 or observations.shape[1] != OBS_DIM:
+            raise SchemaMismatchError(f"Segment observations have shape {observations.shape}, expected (T, {OBS_DIM})")
+
+        segment = {
+            'observations': observations,
+            'actions': np.asarray(message['actions'], dtype=np.int64),
+            'rewards': np.asarray(message['rewards'], dtype=np.float32),
+            'log_probs': np.asarray(message['log_probs'], dtype=np.float32),
+            'dones': np.asarray(message['dones'], dtype=np.float32),
+            'policy_version': int(message.get('policy_version', 0)),
+        }
+        length = len(observations)
+        for key in ('actions', 'rewards', 'log_probs', 'dones'):
+            if len(segment[key]) != length:
+                raise ValueError(f"Segment field '{key}' has {len(segment[key])} entries, expected {length}")
+        if length < 2:
+            return 0
+
+        self.segments.append(segment)
+        self.queued_steps += length
+        self.stats['segments_received'] += 1
+        self.stats['steps_received'] += length
+        return length
+
+    def ready(self) -> bool:
+        return self.queued_steps >= self.batch_steps
+
+    def take_batch(self) -> List[Dict[str, np.ndarray]]:
+        """Remove all queued segments, dropping those too stale to correct."""
+        segments, self.segments, self.queued_steps = self.segments, [], 0
+        fresh = [s for s in segments if self.version - s['policy_version'] <= self.max_policy_lag]
+        self.stats['segments_dropped'] += len(segments) - len(fresh)
+        return fresh
+
+    def update(self, segments: Optional[List[Dict[str, np.ndarray]]] = None) -> Optional[Dict[str, float]]:
+        """Run one V-trace actor-critic update on the given (or all queued) segments.
+
+        The last step of a segment that did not end an episode has no successor
+        state, so it only provides the bootstrap value.
+        """
+        if segments is None:
+            segments = self.take_batch()
+        if not segments:
+            return None
+
+        with self.lock:
+            return self._update(segments)
+
+    def _update(self, segments: List[Dict[str, np.ndarray]]) -> Dict[str, float]:
+        self.model.train()
+        lengths = [len(s['rewards']) for s in segments]
+        obs = torch.from_numpy(np.concatenate([s['observations'] for s in segments])).to(self.device)
+        actions = torch.from_numpy(np.concatenate([s['actions'] for s in segments])).to(self.device)
+        behaviour_log_probs = np.concatenate([s['log_probs'] for s in segments])
+
+        logits, values = self.model(obs)
+        values = values.squeeze(-1)
+        log_probs_all = F.log_softmax(logits, dim=-1)
+        action_log_probs = log_probs_all.gather(1, actions.unsqueeze(1)).squeeze(1)
+        entropy = -(log_probs_all.exp() * log_probs_all).sum(-1)
+
+        # V-trace targets per segment (no gradient)
+        log_rhos = action_log_probs.detach().cpu().numpy() - behaviour_log_probs
+        values_np = values.detach().cpu().numpy()
+        vs = np.zeros_like(values_np)
+        advantages = np.zeros_like(values_np)
+        mask = np.ones_like(values_np)
+        start = 0
+        for segment, length in zip(segments, lengths):
+            end = start + length
+            dones = segment['dones']
+            if dones[-1] > 0.5:
+                steps, bootstrap = length, 0.0
+            else:
+                steps, bootstrap = length - 1, float(values_np[end - 1])
+                mask[end - 1] = 0.0
+            seg = slice(start, start + steps)
+            vs[seg], advantages[seg] = vtrace_targets(
+                log_rhos[seg], segment['rewards'][:steps], self.gamma * (1.0 - dones[:steps]),
+                values_np[seg], bootstrap
+            )
+            start = end
+
+        mask_t = torch.from_numpy(mask).to(self.device)
+        vs_t = torch.from_numpy(vs).to(self.device)
+        adv_t = torch.from_numpy(advantages).to(self.device)
+        num_steps = mask_t.sum().clamp(min=1.0)
+
+        policy_loss = -(adv_t * action_log_probs * mask_t).sum() / num_steps
+        value_loss = 0.5 * (((vs_t - values) ** 2) * mask_t).sum() / num_steps
+        entropy_mean = (entropy * mask_t).sum() / num_steps
+        loss = policy_loss + self.value_coef * value_loss - self.entropy_coef * entropy_mean
+
+        self.optimizer.zero_grad()
+        loss.backward()
+        torch.nn.utils.clip_grad_norm_(self.model.parameters(), max_norm=1.0)
+        self.optimizer.step()
+
+        self.version += 1
+        losses = {
+            'policy_loss': policy_loss.item(),
+            'value_loss': value_loss.item(),
+            'entropy': entropy_mean.item(),
+            'mean_rho': float(np.exp(log_rhos).mean()),
+            'steps': int(mask.sum()),
+            'segments': len(segments),
+        }
+        self.stats['updates'] += 1
+        self.stats['last_losses'] = losses
+        self._publish_weights()
+        return losses
+
+    def _publish_weights(self):
+        """Serialize the current weights for broadcast.
+
+        Runs at the end of every update in the training thread (lock held) and
+        after loading initial weights. The event loop only reads
+        published_weights, a (message, JSON text) pair replaced in a single
+        assignment, so it never waits on an update.
+        """
+        message = {
+            'type': 'weights',
+            'version': self.version,
+            'weights': state_dict_to_tfjs_weights(self.model.state_dict()),
+            **OBS_SCHEMA.describe(),
+        }
+        self.published_weights = (message, json.dumps(message))
+
+
+class LearnerService:
+    """WebSocket front end: receives segments, trains in a worker thread, broadcasts weights."""
+
+    def __init__(self, learner: Learner, host: str = "localhost", port: int = 8765,
+                 output_file: Optional[str] = None, save_every: int = 50):
+        self.learner = learner
+        self.host = host
+        self.port = port
+        self.output_file = output_file
+        self.save_every = save_every
+        self.actors = {}
+        self.data_ready = asyncio.Event()
+        self.started_at = time.time()
+
+    async def handler(self, websocket):
+        actor_id = None
+        try:
+            async for raw in websocket:
+                kind = None
+                try:
+                    message = json.loads(raw)
+                    kind = message.get('type')
+
+                    if kind == 'hello':
+                        OBS_SCHEMA.check(message, f"Actor {message.get('actor_id')}")
+                        actor_id = message.get('actor_id') or f"actor-{len(self.actors) + 1}"
+                        self.actors[actor_id] = websocket
+                        print(f"🔌 {actor_id} connected ({len(self.actors)} actors)")
+                        await websocket.send(self.learner.published_weights[1])
+                    elif kind == 'trajectory':
+                        self.learner.add_segment(message)
+                        if self.learner.ready():
+                            self.data_ready.set()
+                    elif kind == 'get_weights':
+                        published, payload = self.learner.published_weights
+                        if int(message.get('have_version', -1)) < published['version']:
+                            await websocket.send(payload)
+                    elif kind == 'get_stats':
+                        await websocket.send(json.dumps({'type': 'stats', **self.stats_snapshot()}))
+                    else:
+                        print(f"⚠️  Unknown message type from {actor_id}: {kind}")
+                except SchemaMismatchError as e:
+                    if kind == 'hello':
+                        print(f"⚠️  Rejecting actor: {e}")
+                        await websocket.close(code=1008, reason=str(e)[:120])
+                        break
+                    print(f"⚠️  Dropping {kind} message from {actor_id}: {e}")
+                except (AttributeError, KeyError, TypeError, ValueError) as e:
+                    # Includes json.JSONDecodeError; one bad message must not disconnect the actor
+                    print(f"⚠️  Dropping malformed {kind or 'unknown'} message from {actor_id}: {e!r}")
+        finally:
+            if actor_id in self.actors:
+                del self.actors[actor_id]
+                print(f"🔌 {actor_id} disconnected ({len(self.actors)} actors)")
+
+    def stats_snapshot(self) -> Dict:
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        return {
+            'version': self.learner.version,
+            'actors': len(self.actors),
+            'steps_per_second': self.learner.stats['steps_received'] / elapsed,
+            **self.learner.stats,
+        }
+
+    async def train_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.data_ready.wait()
+            self.data_ready.clear()
+            # Take the batch here, then train off the event loop so actors keep streaming
+            segments = self.learner.take_batch()
+            losses = await loop.run_in_executor(None, self.learner.update, segments)
+            if losses is None:
+                continue
+
+            version = self.learner.version
+            print(f"  Update v{version}: {losses['steps']} steps from {losses['segments']} segments, "
+                  f"policy={losses['policy_loss']:.4f}, value={losses['value_loss']:.4f}, "
+                  f"entropy={losses['entropy']:.4f}, mean_rho={losses['mean_rho']:.3f}")
+
+            payload = self.learner.published_weights[1]
+            await asyncio.gather(*(ws.send(payload) for ws in list(self.actors.values())),
+                                 return_exceptions=True)
+
+            if self.output_file and version % self.save_every == 0:
+                self.save(self.output_file)
+            if self.learner.ready():
+                self.data_ready.set()
+
+    def save(self, filepath: str):
+        """Write the current policy in the format game.js loads (pretrained_model.json)."""
+        message = self.learner.published_weights[0]
+        output = {
+            'weights': message['weights'],
+            'weights_layout': 'tfjs',
+            **OBS_SCHEMA.describe(),
+            'learner_version': message['version'],
+            'schema_migrations': self.learner.schema_migrations,
+            'pretrained': True,
+            'episode': 0,
+            'bestScore': 0,
+        }
+        tmp_path = filepath + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(output, f)
+        os.replace(tmp_path, filepath)
+        print(f"💾 Saved learner weights v{message['version']} to {filepath}")
+
+    async def serve(self):
+        import websockets
+
+        print(f"🧠 Learner listening on ws://{self.host}:{self.port} (schema {OBS_SCHEMA.hash})")
+        async with websockets.serve(self.handler, self.host, self.port, max_size=None):
+            await self.train_loop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Centralized learner for distributed Asteroid Droid actors')
+    parser.add_argument('--host', type=str, default='localhost', help='Host to bind (default: localhost)')
+    parser.add_argument('--port', type=int, default=8765, help='WebSocket port (default: 8765)')
+    parser.add_argument('--init_from', type=str, default=None, help='Pretrained model JSON to start from')
+    parser.add_argument('--output', type=str, default='learner_model.json', help='Output model file (default: learner_model.json)')
+    parser.add_argument('--save_every', type=int, default=50, help='Save every N updates (default: 50)')
+    parser.add_argument('--batch_steps', type=int, default=2048, help='Steps per update (default: 2048)')
+    parser.add_argument('--max_policy_lag', type=int, default=20, help='Drop segments more than N versions old (default: 20)')
+    parser.add_argument('--lr', type=float, default=3e-4, help='Learning rate (default: 3e-4)')
+    parser.add_argument('--gamma', type=float, default=0.99, help='Discount factor (default: 0.99)')
+    parser.add_argument('--device', type=str, default='cpu', help='Device to use (cpu or cuda) (default: cpu)')
+    args = parser.parse_args()
+
+    learner = Learner(lr=args.lr, gamma=args.gamma, batch_steps=args.batch_steps,
+                      max_policy_lag=args.max_policy_lag, device=args.device)
+    if args.init_from:
+        try:
+            learner.load_initial_weights(args.init_from)
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+
+    service = LearnerService(learner, args.host, args.port, output_file=args.output, save_every=args.save_every)
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        service.save(args.output)
+
+
+if __name__ == '__main__':
+    main()
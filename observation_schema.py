@@ -0,0 +1,232 @@
+"""
+Observation schema for the Asteroid Droid agent.
+
+Single definition of the observation layout produced by getGameObservation()
+in game.js. Training, pretraining and export code address observation fields
+by name through this module instead of hard-coded indices, and every dataset,
+checkpoint and exported model is stamped with the schema hash so a layout
+mismatch is caught when the file is loaded rather than after a training run.
+"""
+
+import hashlib
+import json
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SchemaMismatchError(ValueError):
+    """Raised when a dataset or model was produced with a different observation schema."""
+
+
+class ObservationSchema:
+    """Named, ordered layout of a flat observation vector.
+
+    Each field is ``(name, shape, columns)``. ``shape`` is ``()`` for scalars,
+    ``(n,)`` for vectors and ``(slots, values)`` for per-object slots such as
+    the nearest enemies. ``columns`` optionally names the last axis, so that
+    ``view(obs, 'enemies', 'dist')`` returns the distance of every enemy slot.
+
+    All accessors return views into the caller's array (no copies), for both a
+    single ``(obs_dim,)`` observation and a batched ``(N, obs_dim)`` array.
+    Writing through a view writes into the observation.
+    """
+
+    def __init__(self, fields: Sequence[Tuple], actions: Sequence[str]):
+        self.fields = []
+        self.slices: Dict[str, slice] = {}
+        self.shapes: Dict[str, Tuple[int, ...]] = {}
+        self.columns: Dict[str, Tuple[str, ...]] = {}
+
+        offset = 0
+        for field in fields:
+            name, shape = field[0], tuple(field[1])
+            columns = tuple(field[2]) if len(field) > 2 else ()
+            if name in self.slices:
+                raise ValueError(f"Duplicate observation field '{name}'")
+            if columns and (not shape or len(columns) != shape[-1]):
+                raise ValueError(f"Field '{name}' has {len(columns)} column names for shape {shape}")
+            size = int(np.prod(shape)) if shape else 1
+            self.fields.append((name, shape, columns))
+            self.slices[name] = slice(offset, offset + size)
+            self.shapes[name] = shape
+            self.columns[name] = columns
+            offset += size
+
+        self.dim = offset
+        self.actions = {name: i for i, name in enumerate(actions)}
+        self.num_actions = len(self.actions)
+        self.hash = self._compute_hash()
+
+    def _compute_hash(self) -> str:
+        layout = {
+            'fields': [[name, list(shape), list(columns)] for name, shape, columns in self.fields],
+            'actions': list(self.actions),
+        }
+        encoded = json.dumps(layout, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+    def view(self, obs: np.ndarray, name: str, column: Optional[str] = None) -> np.ndarray:
+        """Return a zero-copy view of field ``name`` in ``obs``.
+
+        The result has shape ``obs.shape[:-1] + field_shape``, or
+        ``obs.shape[:-1] + (slots,)`` when a ``column`` of a slotted field is
+        selected (a column of a plain vector field is a single element).
+        """
+        if obs.shape[-1] != self.dim:
+            raise SchemaMismatchError(f"Observation has {obs.shape[-1]} dims, schema expects {self.dim}")
+        field_slice = self.slices[name]
+        shape = self.shapes[name]
+        batch_shape = obs.shape[:-1]
+
+        if column is not None:
+            columns = self.columns[name]
+            if column not in columns:
+                raise KeyError(f"Field '{name}' has no column '{column}' (columns: {columns})")
+            if len(shape) == 1:
+                return obs[..., field_slice.start + columns.index(column)]
+            # Every slot stores its values contiguously, so one column is a strided slice
+            return obs[..., field_slice.start + columns.index(column):field_slice.stop:len(columns)]
+
+        if not shape:
+            return obs[..., field_slice.start]
+        # Splitting the last axis into (slots, values) never needs a copy
+        return obs[..., field_slice].reshape(batch_shape + shape)
+
+    def index(self, name: str, slot: int = 0, column: Optional[str] = None) -> int:
+        """Return the flat index of one element of a field within the observation."""
+        field_slice = self.slices[name]
+        columns = self.columns[name]
+        width = len(columns) if columns else 1
+        offset = slot * width + (columns.index(column) if column is not None else 0)
+        if offset >= field_slice.stop - field_slice.start:
+            raise IndexError(f"Slot {slot} out of range for field '{name}'")
+        return field_slice.start + offset
+
+    def element_indices(self) -> Dict[Tuple, int]:
+        """Map every observation element to its flat index.
+
+        Keys are ``(field,)`` for scalars, ``(field, column_or_index)`` for
+        vectors and ``(field, slot, column_or_index)`` for slotted fields, so
+        two layouts can be matched element by element (see schema_migration.py).
+        """
+        indices = {}
+        for name, shape, columns in self.fields:
+            start = self.slices[name].start
+            if not shape:
+                indices[(name,)] = start
+                continue
+            labels = columns or tuple(range(shape[-1]))
+            if len(shape) == 1:
+                for i, label in enumerate(labels):
+                    indices[(name, label)] = start + i
+            else:
+                for slot in range(shape[0]):
+                    for i, label in enumerate(labels):
+                        indices[(name, slot, label)] = start + slot * shape[-1] + i
+        return indices
+
+    def describe(self) -> Dict:
+        """Metadata stored alongside datasets, checkpoints and exports."""
+        return {
+            'schema_hash': self.hash,
+            'obs_dim': self.dim,
+            'action_dim': self.num_actions,
+        }
+
+    def check(self, metadata: Dict, source: str) -> None:
+        """Validate schema metadata of a loaded file before any work is done.
+
+        Files that predate schema hashes are accepted only if their recorded
+        dimensions match this schema.
+        """
+        found_hash = metadata.get('schema_hash')
+        if found_hash is not None:
+            if found_hash != self.hash:
+                raise SchemaMismatchError(
+                    f"{source} was produced with observation schema {found_hash}, "
+                    f"current schema is {self.hash} (obs_dim {self.dim}, action_dim {self.num_actions})"
+                )
+            return
+
+        for key, expected in (('obs_dim', self.dim), ('action_dim', self.num_actions)):
+            found = metadata.get(key)
+            if found is not None and found != expected:
+                raise SchemaMismatchError(f"{source} has {key}={found}, current schema expects {expected}")
+
+
+# Actions (matches game.js ACTIONS, in index order)
+ACTION_NAMES = (
+    'NO_OP', 'MOVE_UP', 'MOVE_DOWN', 'MOVE_LEFT', 'MOVE_RIGHT',
+    'ROTATE_LEFT', 'ROTATE_RIGHT', 'SHOOT_PRIMARY', 'SHOOT_MISSILE',
+    'SHOOT_LASER', 'ACTIVATE_TRACTOR', 'ASSIGN_CREW_SHIELDS',
+    'ASSIGN_CREW_ENGINEERING', 'ASSIGN_CREW_WEAPONS',
+    'ASSIGN_CREW_NAVIGATION', 'UNASSIGN_CREW',
+    'SELECT_UPGRADE_HEALTH', 'SELECT_UPGRADE_SHIELDS',
+    'SELECT_UPGRADE_ALLY', 'SELECT_UPGRADE_CARGO_ALLY',
+)
+
+# Observation fields (matches game.js getGameObservation push order)
+OBS_FIELDS = (
+    # Player state (0-5)
+    ('player_position', (2,), ('x', 'y')),
+    ('player_rotation', ()),
+    ('player_health', ()),
+    ('player_shields', ()),
+    ('player_rotation_speed', ()),
+    # Nearest 5 enemies (6-20)
+    ('enemies', (5, 3), ('dist', 'angle', 'health')),
+    # Nearest 5 asteroids (21-30)
+    ('asteroids', (5, 2), ('dist', 'angle')),
+    # Weapons (31-35)
+    ('primary_cooldown', ()),
+    ('missile_cooldown', ()),
+    ('missile_ammo', ()),
+    ('laser_cooldown', ()),
+    ('laser_ammo', ()),
+    # Tractor beam (36-37)
+    ('tractor_charge', ()),
+    ('tractor_active', ()),
+    # Score/level (38-39)
+    ('score', ()),
+    ('level', ()),
+    # Nearest 5 enemy bullets (40-49)
+    ('bullets', (5, 2), ('dist', 'angle')),
+    # Cargo vessel (50-53)
+    ('cargo', (4,), ('dist', 'angle', 'health', 'direction')),
+    # Crew per station (54-57)
+    ('crew', (4,), ('shields', 'engineering', 'weapons', 'navigation')),
+    # Upgrade menu open (58)
+    ('upgrade_menu', ()),
+    # Nearest 2 powerups (59-62)
+    ('powerups', (2, 2), ('dist', 'angle')),
+)
+
+OBS_SCHEMA = ObservationSchema(OBS_FIELDS, ACTION_NAMES)
+OBS_DIM = OBS_SCHEMA.dim
+NUM_ACTIONS = OBS_SCHEMA.num_actions
+ACTIONS = OBS_SCHEMA.actions
+SCHEMA_HASH = OBS_SCHEMA.hash
+
+# Layouts of earlier releases, kept so their exports can be migrated (schema_migration.py)
+LEGACY_SCHEMAS = {
+    # Before the nearest-powerup slots were added (obs_dim 59)
+    'v59_no_powerups': ObservationSchema(OBS_FIELDS[:-1], ACTION_NAMES),
+}
+
+
+def find_schema(metadata: Dict) -> Optional[ObservationSchema]:
+    """Identify the layout a file was produced with from its metadata.
+
+    Files that predate schema hashes are matched on obs_dim/action_dim.
+    Returns None if no known layout matches.
+    """
+    schemas = [OBS_SCHEMA] + list(LEGACY_SCHEMAS.values())
+    found_hash = metadata.get('schema_hash')
+    if found_hash is not None:
+        return next((schema for schema in schemas if schema.hash == found_hash), None)
+
+    matches = [schema for schema in schemas
+               if schema.dim == metadata.get('obs_dim') and
+               schema.num_actions == metadata.get('action_dim', schema.num_actions)]
+    return matches[0] if len(matches) == 1 else None
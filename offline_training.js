@@ -7,6 +7,11 @@
  * progress until the target score is achieved. When finished, it exports
  * the trained weights to pretrained_model.json so the browser build can
  * load the stronger agent immediately.
+ *
+ * With LEARNER_URL set (e.g. ws://localhost:8765 from learner_service.py),
+ * ACTORS headless pages are launched as pure actors: they stream experience
+ * to the Python learner and load the weights it broadcasts instead of
+ * training in the page.
  */
 
 const path = require('path');
@@ -23,6 +28,8 @@ const OUTPUT_PATH = path.resolve(process.env.OUTPUT_PATH || path.join(ROOT, 'pre
 const SPEED_MULTIPLIER = parseFloat(process.env.SPEED_MULTIPLIER || '10'); // Increased default speed
 const OBSERVER_PORT = parseInt(process.env.OBSERVER_PORT || '4174', 10);
 const ENABLE_OBSERVER = process.env.ENABLE_OBSERVER !== '0'; // Default to enabled
+const LEARNER_URL = process.env.LEARNER_URL || '';
+const ACTORS = LEARNER_URL ? parseInt(process.env.ACTORS || '4', 10) : 1;
 
 function delay(ms) {
     return new Promise(resolve => setTimeout(resolve, ms));
@@ -67,32 +74,52 @@ async function main() {
     try {
         browser = await puppeteer.launch({
             headless: 'new',
-            args: ['--no-sandbox', '--disable-gpu', '--disable-setuid-sandbox'],
+            // Keep background tabs at full speed when several actors share one browser
+            args: ['--no-sandbox', '--disable-gpu', '--disable-setuid-sandbox',
+                   '--disable-background-timer-throttling', '--disable-renderer-backgrounding',
+                   '--disable-backgrounding-occluded-windows'],
             timeout: 60000
         });
         
-        const page = await browser.newPage();
-        const targetUrl = `http://localhost:${PORT}/index.html?offline=1&headless=1&speed=${SPEED_MULTIPLIER}`;
-        console.log(`[trainer] Launching headless training client (${SPEED_MULTIPLIER}x speed)`);
-        console.log(`[trainer] Training runs in background - observer window shows progress without slowing it down`);
-        await page.goto(targetUrl, { waitUntil: 'networkidle2' });
+        const pages = [];
+        for (let i = 0; i < ACTORS; i++) {
+            const page = await browser.newPage();
+            let targetUrl = `http://localhost:${PORT}/index.html?offline=1&headless=1&speed=${SPEED_MULTIPLIER}`;
+            if (LEARNER_URL) {
+                targetUrl += `&learner=${encodeURIComponent(LEARNER_URL)}&actor=browser-${i + 1}`;
+            }
+            pages.push({ page, targetUrl });
+        }
         
-        await page.waitForFunction(() => window.offlineAPIReady === true, { timeout: 60000 });
+        if (LEARNER_URL) {
+            console.log(`[trainer] Launching ${ACTORS} headless actors (${SPEED_MULTIPLIER}x speed) for learner ${LEARNER_URL}`);
+        } else {
+            console.log(`[trainer] Launching headless training client (${SPEED_MULTIPLIER}x speed)`);
+        }
+        console.log(`[trainer] Training runs in background - observer window shows progress without slowing it down`);
+        for (const { page, targetUrl } of pages) {
+            await page.goto(targetUrl, { waitUntil: 'networkidle2' });
+            await page.waitForFunction(() => window.offlineAPIReady === true, { timeout: 60000 });
+        }
         console.log('[trainer] Offline API ready, enabling autopilot training...');
-        await page.evaluate(() => {
-            window.offlineAPI.ensureAutopilot();
-            return true;
-        });
+        for (const { page } of pages) {
+            await page.evaluate(() => {
+                window.offlineAPI.ensureAutopilot();
+                return true;
+            });
+        }
         
         let bestScore = 0;
         let episode = 0;
         while (bestScore < TARGET_SCORE && episode < MAX_EPISODES) {
             await delay(POLL_INTERVAL);
-            const stats = await page.evaluate(() => window.offlineAPI.getTrainingStats());
-            episode = stats.episode || 0;
-            bestScore = stats.bestScore || 0;
-            const avgReward = Number(stats.avgReward || 0).toFixed(2);
-            console.log(`[trainer] Episode ${episode.toString().padStart(4, ' ')} | Best ${bestScore} | Last ${stats.lastScore || 0} | AvgReward ${avgReward}`);
+            const allStats = await Promise.all(pages.map(({ page }) => page.evaluate(() => window.offlineAPI.getTrainingStats())));
+            episode = allStats.reduce((sum, stats) => sum + (stats.episode || 0), 0);
+            bestScore = Math.max(...allStats.map(stats => stats.bestScore || 0));
+            const lastScore = allStats[0].lastScore || 0;
+            const avgReward = (allStats.reduce((sum, stats) => sum + Number(stats.avgReward || 0), 0) / allStats.length).toFixed(2);
+            const versionInfo = LEARNER_URL ? ` | Policy v${Math.min(...allStats.map(stats => stats.policyVersion ?? -1))}` : '';
+            console.log(`[trainer] Episode ${episode.toString().padStart(4, ' ')} | Best ${bestScore} | Last ${lastScore} | AvgReward ${avgReward}${versionInfo}`);
         }
         
         if (bestScore >= TARGET_SCORE) {
@@ -101,7 +128,8 @@ async function main() {
             console.log('[trainer] Max episodes reached, exporting current best model...');
         }
         
-        const modelPayload = await page.evaluate(() => window.offlineAPI.exportModel());
+        // Every actor holds the learner's weights, so the first page is as good as any
+        const modelPayload = await pages[0].page.evaluate(() => window.offlineAPI.exportModel());
         fs.writeFileSync(OUTPUT_PATH, JSON.stringify(modelPayload, null, 2));
         console.log(`[trainer] Saved pretrained model to ${OUTPUT_PATH}`);
     } catch (error) {
@@ -0,0 +1,237 @@
+"""
+ONNX export, validation and ONNX Runtime inference for Asteroid Droid policies.
+
+Both training scripts export through export_onnx(), which checks the exported
+graph against the PyTorch model on a large random batch before returning.
+OnnxPolicy is the ONNX Runtime inference backend used by evaluation and
+labeling tools; it refuses models exported for another observation schema.
+
+Report inference latency for an exported model:
+    python onnx_export.py models/asteroid_droid_agent.onnx
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from observation_schema import OBS_SCHEMA, SchemaMismatchError
+
+# Opset 18 keeps LayerNormalization as a single fused op (also supported by onnxruntime-web)
+ONNX_OPSET = 18
+LATENCY_BATCH_SIZES = (1, 32, 1024)
+
+
+class OnnxValidationError(RuntimeError):
+    """Raised when an exported ONNX model does not reproduce the PyTorch outputs."""
+
+
+def export_onnx(model: nn.Module, filepath: str, obs_dim: int, validate: bool = True,
+                num_samples: int = 4096, atol: float = 1e-4, rtol: float = 1e-3,
+                metadata: Optional[Dict] = None) -> Optional[Dict[str, float]]:
+    """Export a policy network (obs -> action_logits, value) to ONNX.
+
+    The batch axis is dynamic and the observation schema is stored in the
+    model metadata, together with any extra metadata entries (non-string
+    values are JSON-encoded, e.g. 'schema_migrations'). Unless validate is False, the exported graph is run with
+    ONNX Runtime on num_samples random observations and compared to PyTorch.
+
+    The model is written to filepath only after it passes validation; a failed
+    export leaves any existing file at filepath untouched.
+
+    Returns:
+        Max absolute errors per output if validated, else None
+    """
+    import onnx
+
+    was_training = model.training
+    model.eval()
+    device = next(model.parameters()).device
+    # Batch of 2: torch.export specializes size-1 dims, which would pin the batch axis
+    dummy_input = torch.randn(2, obs_dim, device=device)
+
+    # Export next to the target and only move it into place once it validates
+    tmp_path = filepath + '.tmp'
+    try:
+        torch.onnx.export(
+            model,
+            dummy_input,
+            tmp_path,
+            input_names=['observation'],
+            output_names=['action_logits', 'value'],
+            dynamic_shapes=({0: torch.export.Dim('batch_size')},),
+            opset_version=ONNX_OPSET,
+            external_data=False,  # weights inline, no <filepath>.data sidecar
+            do_constant_folding=True
+        )
+
+        # Stamp the observation schema into the model metadata
+        onnx_model = onnx.load(tmp_path)
+        del onnx_model.metadata_props[:]
+        for key, value in {**OBS_SCHEMA.describe(), **(metadata or {})}.items():
+            entry = onnx_model.metadata_props.add()
+            entry.key = key
+            entry.value = value if isinstance(value, str) else json.dumps(value)
+        onnx.checker.check_model(onnx_model)
+        onnx.save(onnx_model, tmp_path)
+
+        errors = None
+        if validate:
+            errors = validate_onnx(model, tmp_path, obs_dim, num_samples=num_samples, atol=atol, rtol=rtol)
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        model.train(was_training)
+    return errors
+
+
+def validate_onnx(model: nn.Module, filepath: str, obs_dim: int, num_samples: int = 4096,
+                  atol: float = 1e-4, rtol: float = 1e-3, seed: int = 0) -> Dict[str, float]:
+    """Compare ONNX Runtime outputs with PyTorch on a random batch.
+
+    An output passes if its max absolute error is within atol + rtol * max|output|,
+    so trained models with large logits are held to fp32 precision rather than a
+    fixed absolute bound. The batch comes from a seeded local generator, which
+    keeps the check reproducible and leaves the global NumPy RNG untouched.
+    """
+    rng = np.random.default_rng(seed)
+    obs = rng.uniform(-1, 1, (num_samples, obs_dim)).astype(np.float32)
+
+    model.eval()
+    device = next(model.parameters()).device
+    with torch.no_grad():
+        torch_logits, torch_value = model(torch.from_numpy(obs).to(device))
+    expected = {'action_logits': torch_logits.cpu().numpy(), 'value': torch_value.cpu().numpy()}
+
+    onnx_logits, onnx_value = OnnxPolicy(filepath).predict(obs)
+    actual = {'action_logits': onnx_logits, 'value': onnx_value}
+
+    errors = {}
+    for name in expected:
+        errors[name] = float(np.max(np.abs(expected[name] - actual[name])))
+        tolerance = atol + rtol * float(np.max(np.abs(expected[name])))
+        if not errors[name] <= tolerance:
+            raise OnnxValidationError(
+                f"{filepath}: '{name}' differs from PyTorch by up to {errors[name]:.2e} "
+                f"on {num_samples} samples (tolerance {tolerance:.2e} = atol {atol} + rtol {rtol} * max|{name}|)"
+            )
+    agreement = float(np.mean(expected['action_logits'].argmax(1) == actual['action_logits'].argmax(1)))
+    print(f"✅ ONNX validated on {num_samples} samples: max |Δlogits| {errors['action_logits']:.2e}, "
+          f"max |Δvalue| {errors['value']:.2e}, argmax agreement {agreement * 100:.2f}%")
+    return errors
+
+
+class OnnxPolicy:
+    """ONNX Runtime inference backend for an exported policy.
+
+    predict() takes a single observation or an (N, obs_dim) batch and returns
+    (action_logits, value) as NumPy arrays.
+    """
+
+    def __init__(self, filepath: str, num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(filepath, options, providers=['CPUExecutionProvider'])
+        self.filepath = filepath
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        schema = {key: int(value) if key in ('obs_dim', 'action_dim') else value
+                  for key, value in metadata.items()}
+        OBS_SCHEMA.check(schema, filepath)
+        self.obs_dim = self.session.get_inputs()[0].shape[1]
+        if self.obs_dim != OBS_SCHEMA.dim:
+            raise SchemaMismatchError(f"{filepath} expects {self.obs_dim}-dim observations, schema has {OBS_SCHEMA.dim}")
+
+    def predict(self, obs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        obs = np.asarray(obs, dtype=np.float32)
+        if obs.ndim == 1:
+            obs = obs[None, :]
+        logits, value = self.session.run(None, {'observation': obs})
+        return logits, value
+
+    def get_actions(self, obs: np.ndarray, deterministic: bool = True) -> np.ndarray:
+        """Actions for a batch of observations (argmax, or sampled from the softmax)."""
+        logits, _ = self.predict(obs)
+        if deterministic:
+            return logits.argmax(axis=1)
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        cumulative = probs.cumsum(axis=1)
+        draws = np.random.random((len(probs), 1))
+        return np.minimum((cumulative < draws).sum(axis=1), probs.shape[1] - 1)
+
+
+def _percentiles(timings: Sequence[float]) -> Dict[str, float]:
+    timings_ms = np.asarray(timings) * 1000.0
+    return {'p50_ms': float(np.percentile(timings_ms, 50)), 'p99_ms': float(np.percentile(timings_ms, 99))}
+
+
+def benchmark_latency(policy: OnnxPolicy, batch_sizes: Sequence[int] = LATENCY_BATCH_SIZES,
+                      iterations: int = 200, warmup: int = 20,
+                      torch_model: Optional[nn.Module] = None) -> Dict[int, Dict[str, float]]:
+    """Measure p50/p99 inference latency per batch size.
+
+    If torch_model is given, eager PyTorch is measured on the same inputs for comparison.
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        obs = np.random.uniform(-1, 1, (batch_size, policy.obs_dim)).astype(np.float32)
+        for _ in range(warmup):
+            policy.predict(obs)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            policy.predict(obs)
+            timings.append(time.perf_counter() - start)
+        results[batch_size] = _percentiles(timings)
+
+        if torch_model is not None:
+            torch_model.eval()
+            obs_tensor = torch.from_numpy(obs)
+            timings = []
+            with torch.no_grad():
+                for _ in range(warmup):
+                    torch_model(obs_tensor)
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    torch_model(obs_tensor)
+                    timings.append(time.perf_counter() - start)
+            torch_stats = _percentiles(timings)
+            results[batch_size]['torch_p50_ms'] = torch_stats['p50_ms']
+            results[batch_size]['torch_p99_ms'] = torch_stats['p99_ms']
+    return results
+
+
+def print_latency_report(results: Dict[int, Dict[str, float]]):
+    print("ONNX Runtime latency:")
+    for batch_size, stats in results.items():
+        line = f"  batch {batch_size:>5}: p50 {stats['p50_ms']:.3f} ms, p99 {stats['p99_ms']:.3f} ms"
+        if 'torch_p50_ms' in stats:
+            line += (f" | torch eager p50 {stats['torch_p50_ms']:.3f} ms, p99 {stats['torch_p99_ms']:.3f} ms"
+                     f" ({stats['torch_p50_ms'] / stats['p50_ms']:.1f}x)")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report ONNX Runtime latency for an exported Asteroid Droid model')
+    parser.add_argument('model', type=str, help='Path to .onnx model')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed runs per batch size (default: 200)')
+    parser.add_argument('--threads', type=int, default=0, help='ONNX Runtime intra-op threads, 0 = default (default: 0)')
+    args = parser.parse_args()
+
+    policy = OnnxPolicy(args.model, num_threads=args.threads)
+    print_latency_report(benchmark_latency(policy, iterations=args.iterations))
+
+
+if __name__ == '__main__':
+    main()
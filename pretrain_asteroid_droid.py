@@ -11,20 +11,9 @@ import torch.optim as optim
 import json
 import os
 
-# Updated observation dimensions (matches game.js exactly)
-OBS_DIM = 63  # Fixed: was 59, game.js uses 63 (added powerups: 2 * 2 = 4 dimensions)
-NUM_ACTIONS = 20
-
-# Action constants (matches game.js ACTIONS)
-ACTIONS = {
-    'NO_OP': 0, 'MOVE_UP': 1, 'MOVE_DOWN': 2, 'MOVE_LEFT': 3, 'MOVE_RIGHT': 4,
-    'ROTATE_LEFT': 5, 'ROTATE_RIGHT': 6, 'SHOOT_PRIMARY': 7, 'SHOOT_MISSILE': 8,
-    'SHOOT_LASER': 9, 'ACTIVATE_TRACTOR': 10, 'ASSIGN_CREW_SHIELDS': 11,
-    'ASSIGN_CREW_ENGINEERING': 12, 'ASSIGN_CREW_WEAPONS': 13,
-    'ASSIGN_CREW_NAVIGATION': 14, 'UNASSIGN_CREW': 15,
-    'SELECT_UPGRADE_HEALTH': 16, 'SELECT_UPGRADE_SHIELDS': 17,
-    'SELECT_UPGRADE_ALLY': 18, 'SELECT_UPGRADE_CARGO_ALLY': 19
-}
+from observation_schema import OBS_SCHEMA, OBS_DIM, NUM_ACTIONS, ACTIONS, SchemaMismatchError, find_schema
+from schema_migration import migrate_state_dict, describe_migration
+from weight_layout import weights_layout, weights_to_state_dict
 
 class PolicyNetwork(nn.Module):
     """Policy network matching TensorFlow.js structure exactly."""
@@ -47,26 +36,74 @@ class PolicyNetwork(nn.Module):
         shared = self.shared(x)
         return self.policy_head(shared), self.value_head(shared)
 
+# Flat observation indices for generate_synthetic_observation() and
+# get_heuristic_action(), which both run once per generated sample. view()
+# re-checks dims and slices on every call, so it is kept for batched code and
+# these hot paths use indices resolved once at import.
+def _slot_indices(name, *columns):
+    """Per-slot tuples of flat indices for the given columns of a slotted field."""
+    return tuple(tuple(OBS_SCHEMA.index(name, slot, column) for column in columns)
+                 for slot in range(OBS_SCHEMA.shapes[name][0]))
+
+_PLAYER_POSITION = OBS_SCHEMA.slices['player_position']
+_PLAYER_ROTATION = OBS_SCHEMA.index('player_rotation')
+_PLAYER_HEALTH = OBS_SCHEMA.index('player_health')
+_PLAYER_SHIELDS = OBS_SCHEMA.index('player_shields')
+_PLAYER_ROTATION_SPEED = OBS_SCHEMA.index('player_rotation_speed')
+_ENEMY_SLOTS = _slot_indices('enemies', 'dist', 'angle', 'health')
+_ASTEROID_SLOTS = _slot_indices('asteroids', 'dist', 'angle')
+_BULLET_SLOTS = _slot_indices('bullets', 'dist', 'angle')
+_POWERUP_SLOTS = _slot_indices('powerups', 'dist', 'angle')
+_ENEMY_DIST = OBS_SCHEMA.index('enemies', 0, 'dist')
+_ENEMY_ANGLE = OBS_SCHEMA.index('enemies', 0, 'angle')
+_BULLET_DIST = OBS_SCHEMA.index('bullets', 0, 'dist')
+_BULLET_ANGLE = OBS_SCHEMA.index('bullets', 0, 'angle')
+_ASTEROID_DIST = OBS_SCHEMA.index('asteroids', 0, 'dist')
+_ASTEROID_ANGLE = OBS_SCHEMA.index('asteroids', 0, 'angle')
+_PRIMARY_COOLDOWN = OBS_SCHEMA.index('primary_cooldown')
+_MISSILE_COOLDOWN = OBS_SCHEMA.index('missile_cooldown')
+_MISSILE_AMMO = OBS_SCHEMA.index('missile_ammo')
+_LASER_COOLDOWN = OBS_SCHEMA.index('laser_cooldown')
+_LASER_AMMO = OBS_SCHEMA.index('laser_ammo')
+_TRACTOR_CHARGE = OBS_SCHEMA.index('tractor_charge')
+_TRACTOR_ACTIVE = OBS_SCHEMA.index('tractor_active')
+_SCORE = OBS_SCHEMA.index('score')
+_LEVEL = OBS_SCHEMA.index('level')
+_CARGO_DIST = OBS_SCHEMA.index('cargo', column='dist')
+_CARGO_ANGLE = OBS_SCHEMA.index('cargo', column='angle')
+_CARGO_HEALTH = OBS_SCHEMA.index('cargo', column='health')
+_CARGO_DIRECTION = OBS_SCHEMA.index('cargo', column='direction')
+_CREW = OBS_SCHEMA.slices['crew']
+_CREW_SHIELDS = OBS_SCHEMA.index('crew', column='shields')
+_CREW_ENGINEERING = OBS_SCHEMA.index('crew', column='engineering')
+_CREW_WEAPONS = OBS_SCHEMA.index('crew', column='weapons')
+_UPGRADE_MENU = OBS_SCHEMA.index('upgrade_menu')
+
 def get_heuristic_action(obs):
     """Heuristic policy matching game.js getHeuristicAction exactly."""
-    player_health = obs[3]
-    player_shields = obs[4]
-    nearest_enemy_dist = obs[6]
-    nearest_enemy_angle = obs[7]
-    nearest_bullet_dist = obs[40]
-    nearest_bullet_angle = obs[41]
-    nearest_asteroid_dist = obs[21]
-    nearest_asteroid_angle = obs[22]
-    primary_ready = obs[31] < 0.1
-    missile_ready = obs[32] < 0.1 and obs[33] > 0
-    laser_ready = obs[34] < 0.1 and obs[35] > 0
-    tractor_charge = obs[36]
-    tractor_active = obs[37] > 0.5
+    if len(obs) != OBS_DIM:
+        raise SchemaMismatchError(f"Observation has {len(obs)} dims, schema expects {OBS_DIM}")
+    player_health = obs[_PLAYER_HEALTH]
+    player_shields = obs[_PLAYER_SHIELDS]
+    nearest_enemy_dist = obs[_ENEMY_DIST]
+    nearest_enemy_angle = obs[_ENEMY_ANGLE]
+    nearest_bullet_dist = obs[_BULLET_DIST]
+    nearest_bullet_angle = obs[_BULLET_ANGLE]
+    nearest_asteroid_dist = obs[_ASTEROID_DIST]
+    nearest_asteroid_angle = obs[_ASTEROID_ANGLE]
+    primary_ready = obs[_PRIMARY_COOLDOWN] < 0.1
+    missile_ready = obs[_MISSILE_COOLDOWN] < 0.1 and obs[_MISSILE_AMMO] > 0
+    laser_ready = obs[_LASER_COOLDOWN] < 0.1 and obs[_LASER_AMMO] > 0
+    tractor_charge = obs[_TRACTOR_CHARGE]
+    tractor_active = obs[_TRACTOR_ACTIVE] > 0.5
     tractor_ready = tractor_charge > 0.3 and not tractor_active
-    cargo_dist = obs[50]
-    cargo_angle = obs[51]
-    cargo_health = obs[52]
+    cargo_dist = obs[_CARGO_DIST]
+    cargo_angle = obs[_CARGO_ANGLE]
+    cargo_health = obs[_CARGO_HEALTH]
     has_cargo = cargo_dist < 0.99
+    crew_shields = obs[_CREW_SHIELDS]
+    crew_engineering = obs[_CREW_ENGINEERING]
+    crew_weapons = obs[_CREW_WEAPONS]
     
     action_scores = np.zeros(NUM_ACTIONS)
     
@@ -128,15 +165,15 @@ def get_heuristic_action(obs):
                 action_scores[ACTIONS['MOVE_DOWN']] += 2
     
     # 6. Crew management
-    if player_shields < 0.3 and obs[54] < 0.8:
+    if player_shields < 0.3 and crew_shields < 0.8:
         action_scores[ACTIONS['ASSIGN_CREW_SHIELDS']] += 1
-    if player_health < 0.4 and obs[55] < 0.8:
+    if player_health < 0.4 and crew_engineering < 0.8:
         action_scores[ACTIONS['ASSIGN_CREW_ENGINEERING']] += 1
-    if nearest_enemy_dist < 0.5 and obs[56] < 0.8:
+    if nearest_enemy_dist < 0.5 and crew_weapons < 0.8:
         action_scores[ACTIONS['ASSIGN_CREW_WEAPONS']] += 1
     
     # 7. Upgrade selection
-    upgrade_menu_open = obs[58] > 0.5
+    upgrade_menu_open = obs[_UPGRADE_MENU] > 0.5
     if upgrade_menu_open:
         if player_health < 0.5:
             action_scores[ACTIONS['SELECT_UPGRADE_HEALTH']] += 3
@@ -156,80 +193,94 @@ def generate_synthetic_observation():
     """Generate synthetic observation matching game.js generateSyntheticObservation."""
     obs = np.zeros(OBS_DIM)
     
-    # Player state (0-5)
-    obs[0:2] = np.random.uniform(-0.4, 0.4, 2)
-    obs[2] = np.random.random()
-    obs[3:5] = np.random.random(2)
-    obs[5] = np.random.uniform(0.1, 0.2)
+    # Player state
+    obs[_PLAYER_POSITION] = np.random.uniform(-0.4, 0.4, 2)
+    obs[_PLAYER_ROTATION] = np.random.random()
+    obs[_PLAYER_HEALTH] = np.random.random()
+    obs[_PLAYER_SHIELDS] = np.random.random()
+    obs[_PLAYER_ROTATION_SPEED] = np.random.uniform(0.1, 0.2)
     
-    # Enemies (6-20): 5 enemies * 3 values
-    for i in range(5):
+    # Enemies: 5 enemies * (dist, angle, health)
+    for dist, angle, health in _ENEMY_SLOTS:
         if np.random.random() < 0.7:
-            obs[6 + i*3] = np.random.random() * 0.8
-            obs[7 + i*3] = np.random.uniform(-1, 1)
-            obs[8 + i*3] = np.random.random()
+            obs[dist] = np.random.random() * 0.8
+            obs[angle] = np.random.uniform(-1, 1)
+            obs[health] = np.random.random()
         else:
-            obs[6 + i*3] = 1.0
+            obs[dist] = 1.0
     
-    # Asteroids (21-30): 5 asteroids * 2 values
-    for i in range(5):
+    # Asteroids: 5 asteroids * (dist, angle)
+    for dist, angle in _ASTEROID_SLOTS:
         if np.random.random() < 0.5:
-            obs[21 + i*2] = np.random.random() * 0.7
-            obs[22 + i*2] = np.random.uniform(-1, 1)
+            obs[dist] = np.random.random() * 0.7
+            obs[angle] = np.random.uniform(-1, 1)
         else:
-            obs[21 + i*2] = 1.0
+            obs[dist] = 1.0
     
-    # Weapons (31-35)
-    obs[31:36] = np.random.random(5)
+    # Weapons
+    (obs[_PRIMARY_COOLDOWN], obs[_MISSILE_COOLDOWN], obs[_MISSILE_AMMO],
+     obs[_LASER_COOLDOWN], obs[_LASER_AMMO]) = np.random.random(5)
     
-    # Tractor beam (36-37)
-    obs[36] = np.random.random()
-    obs[37] = 1.0 if np.random.random() < 0.1 else 0.0
+    # Tractor beam
+    obs[_TRACTOR_CHARGE] = np.random.random()
+    obs[_TRACTOR_ACTIVE] = 1.0 if np.random.random() < 0.1 else 0.0
     
-    # Score/level (38-39)
-    obs[38] = np.random.random() * 0.5
-    obs[39] = np.random.random() * 0.3
+    # Score/level
+    obs[_SCORE] = np.random.random() * 0.5
+    obs[_LEVEL] = np.random.random() * 0.3
     
-    # Enemy bullets (40-49): 5 bullets * 2 values
-    for i in range(5):
+    # Enemy bullets: 5 bullets * (dist, angle)
+    for dist, angle in _BULLET_SLOTS:
         if np.random.random() < 0.3:
-            obs[40 + i*2] = np.random.random() * 0.5
-            obs[41 + i*2] = np.random.uniform(-1, 1)
+            obs[dist] = np.random.random() * 0.5
+            obs[angle] = np.random.uniform(-1, 1)
         else:
-            obs[40 + i*2] = 1.0
+            obs[dist] = 1.0
     
-    # Cargo (50-53)
+    # Cargo (dist, angle, health, direction)
     if np.random.random() < 0.5:
-        obs[50] = np.random.random() * 0.6
-        obs[51] = np.random.uniform(-1, 1)
-        obs[52] = np.random.uniform(0.5, 1.0)
-        obs[53] = 1 if np.random.random() < 0.5 else -1
+        obs[_CARGO_DIST] = np.random.random() * 0.6
+        obs[_CARGO_ANGLE] = np.random.uniform(-1, 1)
+        obs[_CARGO_HEALTH] = np.random.uniform(0.5, 1.0)
+        obs[_CARGO_DIRECTION] = 1 if np.random.random() < 0.5 else -1
     else:
-        obs[50] = 1.0
+        obs[_CARGO_DIST] = 1.0
     
-    # Crew (54-57)
-    obs[54:58] = np.random.random(4)
+    # Crew
+    obs[_CREW] = np.random.random(4)
     
-    # Upgrade menu (58)
-    obs[58] = 1.0 if np.random.random() < 0.1 else 0.0
+    # Upgrade menu
+    obs[_UPGRADE_MENU] = 1.0 if np.random.random() < 0.1 else 0.0
     
-    # Powerups (59-62): 2 powerups * 2 values (dist, angle)
-    for i in range(2):
+    # Powerups: 2 powerups * (dist, angle)
+    for dist, angle in _POWERUP_SLOTS:
         if np.random.random() < 0.3:
-            obs[59 + i*2] = np.random.random() * 0.6
-            obs[60 + i*2] = np.random.uniform(-1, 1)
+            obs[dist] = np.random.random() * 0.6
+            obs[angle] = np.random.uniform(-1, 1)
         else:
-            obs[59 + i*2] = 1.0
-            obs[60 + i*2] = 0.0
+            obs[dist] = 1.0
+            obs[angle] = 0.0
     
     return obs
 
 def load_model_from_json(json_file):
-    """Load model weights from JSON file (for resuming training)."""
+    """Load model weights from JSON file (for resuming training).
+    
+    Accepts pretrain exports as well as game.js and learner_service.py
+    outputs (TF.js weight layout, see weight_layout.py). Weights exported for
+    a known earlier layout (observation_schema.LEGACY_SCHEMAS) are migrated to
+    the current schema and the migration is appended to the returned
+    metadata's 'schema_migrations'. Raises SchemaMismatchError for an
+    unknown layout, before any weights are reconstructed.
+    """
     try:
         with open(json_file, 'r') as f:
             data = json.load(f)
         
+        file_schema = find_schema(data)
+        if file_schema is None:
+            OBS_SCHEMA.check(data, json_file)
+        
         if 'weights' not in data:
             print(f"⚠️  No weights found in {json_file}")
             return None, None
@@ -237,59 +288,28 @@ def load_model_from_json(json_file):
         print(f"✅ Loading model from {json_file}")
         print(f"   Previous obs_dim: {data.get('obs_dim', 'unknown')}")
         print(f"   Previous action_dim: {data.get('action_dim', 'unknown')}")
+        print(f"   Schema hash: {data.get('schema_hash', 'unknown')}")
         print(f"   Previous episode: {data.get('episode', 0)}")
         print(f"   Previous bestScore: {data.get('bestScore', 0)}")
         
-        # Reconstruct weights from JSON
-        weights_data = data['weights']
-        state_dict = {}
-        
-        # Map JSON weights back to PyTorch state dict format
-        # Order: dense1 (weight, bias), layernorm1 (weight, bias), dense2 (weight, bias), layernorm2 (weight, bias), policy_head (weight, bias), value_head (weight, bias)
-        idx = 0
+        # Reconstruct weights from JSON (TensorFlow.js getWeights() order)
+        state_dict = weights_to_state_dict(data['weights'], weights_layout(data))
         
-        # Dense layer 1
-        state_dict['shared.0.weight'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        state_dict['shared.0.bias'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        
-        # LayerNorm 1
-        state_dict['shared.2.weight'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        state_dict['shared.2.bias'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        
-        # Dense layer 2
-        state_dict['shared.3.weight'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        state_dict['shared.3.bias'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        
-        # LayerNorm 2
-        state_dict['shared.5.weight'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        state_dict['shared.5.bias'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        
-        # Policy head
-        state_dict['policy_head.weight'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        state_dict['policy_head.bias'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        
-        # Value head
-        state_dict['value_head.weight'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
-        idx += 1
-        state_dict['value_head.bias'] = torch.FloatTensor(np.array(weights_data[idx]['data']).reshape(weights_data[idx]['shape']))
+        # Weight surgery if the file predates the current observation/action layout
+        if file_schema is not None and file_schema.hash != OBS_SCHEMA.hash:
+            state_dict, migration = migrate_state_dict(state_dict, file_schema, OBS_SCHEMA)
+            print(f"🔧 {describe_migration(migration)}")
+            data = dict(data, schema_migrations=data.get('schema_migrations', []) + [migration])
         
         return state_dict, data
+    except SchemaMismatchError:
+        raise
     except Exception as e:
         print(f"⚠️  Failed to load model from {json_file}: {e}")
         return None, None
 
 
-def pretrain_agent(num_samples=200000, epochs=1000, batch_size=256, output_file='pretrained_model.json', resume_from=None):
+def pretrain_agent(num_samples=200000, epochs=1000, batch_size=256, output_file='pretrained_model.json', resume_from=None, onnx_output=None):
     """Pre-train agent using heuristic policy with extensive training.
     
     Args:
@@ -298,6 +318,7 @@ def pretrain_agent(num_samples=200000, epochs=1000, batch_size=256, output_file=
         batch_size: Batch size for training
         output_file: Output JSON file path
         resume_from: Path to existing model JSON to continue training from
+        onnx_output: Optional path to also export a validated ONNX model
     """
     if resume_from:
         print(f"🔄 Resuming training from {resume_from}")
@@ -493,14 +514,14 @@ def pretrain_agent(num_samples=200000, epochs=1000, batch_size=256, output_file=
     # Save to JSON (preserve previous metadata if resuming)
     output = {
         'weights': weights_data,
-        'obs_dim': OBS_DIM,
-        'action_dim': NUM_ACTIONS,
+        **OBS_SCHEMA.describe(),
         'episode': previous_metadata.get('episode', 0),
         'bestScore': previous_metadata.get('bestScore', 0),
         'pretrained': True,
         'training_epochs': start_epoch + epochs,  # Track total epochs trained
         'best_loss': best_loss,  # Track best loss achieved
-        'resumed_from': resume_from if resume_from else None
+        'resumed_from': resume_from if resume_from else None,
+        'schema_migrations': previous_metadata.get('schema_migrations', [])  # Layout changes these weights went through
     }
     
     with open(output_file, 'w') as f:
@@ -508,6 +529,7 @@ def pretrain_agent(num_samples=200000, epochs=1000, batch_size=256, output_file=
     
     print(f"\n✅ Pre-trained model saved to {output_file}")
     print(f"   Model has {len(weights_data)} weight layers")
+    print(f"   Observation schema: {OBS_SCHEMA.hash} ({OBS_DIM} dims)")
     print(f"   Final training loss: {best_loss:.4f}")
     
     # Test the model
@@ -525,6 +547,13 @@ def pretrain_agent(num_samples=200000, epochs=1000, batch_size=256, output_file=
     
     accuracy = (correct / total) * 100
     print(f"   Test accuracy: {accuracy:.1f}% ({correct}/{total} matches heuristic)")
+    
+    if onnx_output:
+        from onnx_export import export_onnx, OnnxPolicy, benchmark_latency, print_latency_report
+        export_onnx(model, onnx_output, OBS_DIM,
+                    metadata={'schema_migrations': output['schema_migrations']})
+        print(f"   ONNX model saved to {onnx_output}")
+        print_latency_report(benchmark_latency(OnnxPolicy(onnx_output), torch_model=model))
     print(f"\n📦 Deploy {output_file} with your game - the agent will start with this base knowledge!")
 
 if __name__ == '__main__':
@@ -535,8 +564,9 @@ if __name__ == '__main__':
     parser.add_argument('--batch_size', type=int, default=256, help='Batch size (default: 256)')
     parser.add_argument('--output', type=str, default='pretrained_model.json', help='Output file (default: pretrained_model.json)')
     parser.add_argument('--resume_from', type=str, default=None, help='Path to existing model JSON to continue training from')
+    parser.add_argument('--onnx', type=str, default=None, help='Also export a validated ONNX model to this path')
     args = parser.parse_args()
     
-    pretrain_agent(args.samples, args.epochs, batch_size=args.batch_size, output_file=args.output, resume_from=args.resume_from)
+    pretrain_agent(args.samples, args.epochs, batch_size=args.batch_size, output_file=args.output, resume_from=args.resume_from, onnx_output=args.onnx)
 
 
@@ -0,0 +1,92 @@
+"""
+Weight surgery for observation/action layout changes.
+
+When the observation schema gains fields (e.g. obs_dim 59 -> 63 for the
+powerup slots) or the action list changes, a trained PolicyNetwork can be
+carried over instead of retrained: input columns of the first dense layer are
+copied for every observation element both layouts share, and policy head rows
+are copied for every action both layouts share. Only new inputs and actions
+are initialized, so a short fine-tune replaces a from-scratch retrain.
+
+New input columns start at zero, so the migrated network computes exactly the
+same outputs as before until the new inputs receive gradient. New action rows
+get a fresh random init with the lowest existing bias, so new actions start
+out unlikely instead of dominating the policy.
+"""
+
+from typing import Dict, Tuple
+
+import torch
+import torch.nn as nn
+
+from observation_schema import ObservationSchema
+
+INPUT_WEIGHT = 'shared.0.weight'
+POLICY_WEIGHT = 'policy_head.weight'
+POLICY_BIAS = 'policy_head.bias'
+
+
+def migrate_state_dict(state_dict: Dict[str, torch.Tensor], old_schema: ObservationSchema,
+                       new_schema: ObservationSchema) -> Tuple[Dict[str, torch.Tensor], Dict]:
+    """Reshape a PolicyNetwork state dict from old_schema to new_schema.
+
+    Returns:
+        (migrated state dict, migration record for export metadata)
+    """
+    old_weight = state_dict[INPUT_WEIGHT]
+    if old_weight.shape[1] != old_schema.dim:
+        raise ValueError(f"{INPUT_WEIGHT} has {old_weight.shape[1]} inputs, layout {old_schema.hash} has {old_schema.dim}")
+
+    migrated = dict(state_dict)
+
+    # Input columns of the first dense layer, matched element by element
+    old_elements = old_schema.element_indices()
+    new_elements = new_schema.element_indices()
+    shared = [key for key in new_elements if key in old_elements]
+    new_cols = torch.tensor([new_elements[key] for key in shared], dtype=torch.long)
+    old_cols = torch.tensor([old_elements[key] for key in shared], dtype=torch.long)
+    new_weight = old_weight.new_zeros((old_weight.shape[0], new_schema.dim))
+    new_weight[:, new_cols] = old_weight[:, old_cols]
+    migrated[INPUT_WEIGHT] = new_weight
+
+    # Policy head rows, matched by action name
+    old_policy_weight = state_dict[POLICY_WEIGHT]
+    old_policy_bias = state_dict[POLICY_BIAS]
+    fresh_rows = nn.Linear(old_policy_weight.shape[1], new_schema.num_actions).weight.detach()
+    new_policy_weight = fresh_rows.to(old_policy_weight.dtype).clone()
+    new_policy_bias = old_policy_bias.new_full((new_schema.num_actions,), old_policy_bias.min().item())
+    for name, new_row in new_schema.actions.items():
+        old_row = old_schema.actions.get(name)
+        if old_row is not None:
+            new_policy_weight[new_row] = old_policy_weight[old_row]
+            new_policy_bias[new_row] = old_policy_bias[old_row]
+    migrated[POLICY_WEIGHT] = new_policy_weight
+    migrated[POLICY_BIAS] = new_policy_bias
+
+    def fields_of(keys):
+        return sorted({key[0] for key in keys})
+
+    record = {
+        'from_schema': old_schema.hash,
+        'to_schema': new_schema.hash,
+        'from_obs_dim': old_schema.dim,
+        'to_obs_dim': new_schema.dim,
+        'copied_inputs': len(shared),
+        'new_input_fields': fields_of(key for key in new_elements if key not in old_elements),
+        'dropped_input_fields': fields_of(key for key in old_elements if key not in new_elements),
+        'new_actions': [name for name in new_schema.actions if name not in old_schema.actions],
+        'dropped_actions': [name for name in old_schema.actions if name not in new_schema.actions],
+    }
+    return migrated, record
+
+
+def describe_migration(record: Dict) -> str:
+    lines = [f"Migrated weights {record['from_schema']} ({record['from_obs_dim']} dims) -> "
+             f"{record['to_schema']} ({record['to_obs_dim']} dims): {record['copied_inputs']} inputs copied"]
+    for key, label in (('new_input_fields', 'New inputs (zero-initialized)'),
+                       ('dropped_input_fields', 'Dropped inputs'),
+                       ('new_actions', 'New actions (fresh init)'),
+                       ('dropped_actions', 'Dropped actions')):
+        if record[key]:
+            lines.append(f"   {label}: {', '.join(record[key])}")
+    return '\n'.join(lines)
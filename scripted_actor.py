@@ -0,0 +1,117 @@
+"""
+Scripted stand-in actor for the Asteroid Droid learner service.
+
+Plays a synthetic environment instead of the browser game so the actor/learner
+pipeline can be exercised without Chromium: observations come from
+generate_synthetic_observation() and the reward is +1 when the sampled action
+agrees with the heuristic policy. Actions are sampled from the latest weights
+received from the learner, and segments are streamed exactly like the browser
+actor does (?offline=1&headless=1&learner=ws://...).
+
+Run several in parallel to simulate many actors:
+    python learner_service.py &
+    for i in 1 2 3 4; do python scripted_actor.py --actor_id scripted-$i & done
+"""
+
+import argparse
+import asyncio
+import json
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from observation_schema import OBS_SCHEMA, OBS_DIM, NUM_ACTIONS
+from pretrain_asteroid_droid import PolicyNetwork, generate_synthetic_observation, get_heuristic_action
+from weight_layout import tfjs_weights_to_state_dict
+
+
+class ScriptedActor:
+    """Synthetic-environment actor that samples from the learner's current policy."""
+
+    def __init__(self, actor_id: str, segment_length: int = 256, episode_length: int = 1000):
+        self.actor_id = actor_id
+        self.segment_length = segment_length
+        self.episode_length = episode_length
+        self.model = PolicyNetwork(OBS_DIM, NUM_ACTIONS)
+        self.model.eval()
+        self.policy_version = -1
+        self.episode_step = 0
+
+    def load_weights(self, message):
+        self.model.load_state_dict(tfjs_weights_to_state_dict(message['weights']))
+        self.policy_version = message['version']
+
+    def collect_segment(self):
+        """Play segment_length steps with the current policy."""
+        observations = np.stack([generate_synthetic_observation() for _ in range(self.segment_length)])
+        with torch.no_grad():
+            logits, _ = self.model(torch.FloatTensor(observations))
+            log_probs = F.log_softmax(logits, dim=-1)
+            actions = torch.multinomial(log_probs.exp(), 1).squeeze(1)
+            action_log_probs = log_probs.gather(1, actions.unsqueeze(1)).squeeze(1)
+
+        actions = actions.numpy()
+        rewards = [float(a == get_heuristic_action(o)) for o, a in zip(observations, actions)]
+        dones = []
+        for _ in range(self.segment_length):
+            self.episode_step += 1
+            done = self.episode_step >= self.episode_length
+            if done:
+                self.episode_step = 0
+            dones.append(done)
+
+        return {
+            'type': 'trajectory',
+            'actor_id': self.actor_id,
+            'policy_version': self.policy_version,
+            'observations': observations.tolist(),
+            'actions': actions.tolist(),
+            'rewards': rewards,
+            'log_probs': action_log_probs.numpy().tolist(),
+            'dones': dones,
+        }
+
+    async def run(self, url: str, num_segments: int = 0):
+        import websockets
+
+        async with websockets.connect(url, max_size=None) as websocket:
+            await websocket.send(json.dumps({'type': 'hello', 'actor_id': self.actor_id, **OBS_SCHEMA.describe()}))
+            self.load_weights(json.loads(await websocket.recv()))
+            print(f"🤖 {self.actor_id} connected, policy v{self.policy_version}")
+
+            async def receive_weights():
+                async for raw in websocket:
+                    message = json.loads(raw)
+                    if message.get('type') == 'weights':
+                        self.load_weights(message)
+
+            receiver = asyncio.create_task(receive_weights())
+            sent = 0
+            try:
+                while num_segments <= 0 or sent < num_segments:
+                    segment = self.collect_segment()
+                    await websocket.send(json.dumps(segment))
+                    sent += 1
+                    if sent % 20 == 0:
+                        match_rate = np.mean(segment['rewards'])
+                        print(f"  {self.actor_id}: {sent} segments, policy v{self.policy_version}, heuristic match {match_rate:.2f}")
+                    await asyncio.sleep(0)
+            finally:
+                receiver.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scripted stand-in actor for the Asteroid Droid learner')
+    parser.add_argument('--url', type=str, default='ws://localhost:8765', help='Learner URL (default: ws://localhost:8765)')
+    parser.add_argument('--actor_id', type=str, default='scripted-1', help='Actor name (default: scripted-1)')
+    parser.add_argument('--segment_length', type=int, default=256, help='Steps per segment (default: 256)')
+    parser.add_argument('--segments', type=int, default=0, help='Stop after N segments, 0 = run forever (default: 0)')
+    args = parser.parse_args()
+
+    actor = ScriptedActor(args.actor_id, segment_length=args.segment_length)
+    asyncio.run(actor.run(args.url, args.segments))
+
+
+if __name__ == '__main__':
+    main()
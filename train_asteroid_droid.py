@@ -17,15 +17,8 @@ from typing import List, Dict, Tuple
 import argparse
 from datetime import datetime
 
-# Observation dimensions from game.js
-# Player state: 6 (x, y, rotation, health, shields, rotationSpeed)
-# Nearest enemies: 5 * 3 = 15 (dist, angle, health for each)
-# Nearest asteroids: 5 * 2 = 10 (dist, angle for each)
-# Weapon states: 5 (primary cooldown, missile cooldown, missile ammo, laser cooldown, laser ammo)
-# Tractor beam: 2 (charge, active)
-# Score/level: 2
-OBS_DIM = 6 + 15 + 10 + 5 + 2 + 2  # 40 dimensions
-NUM_ACTIONS = 11  # 0-10 actions
+from observation_schema import OBS_SCHEMA, OBS_DIM, NUM_ACTIONS, SchemaMismatchError
+from demo_subsampler import subsample_demo_data
 
 class PolicyNetwork(nn.Module):
     """Policy network for PPO."""
@@ -79,16 +72,22 @@ class AsteroidDroidAgent:
         return action
     
     def train_behavioral_cloning(self, demo_data: List[Dict], epochs: int = 10, batch_size: int = 64):
-        """Train using behavioral cloning (supervised learning on demo data)."""
+        """Train using behavioral cloning (supervised learning on demo data).
+        
+        Frames may carry a 'weight' (set by demo_subsampler for collapsed runs of
+        near-duplicate frames); the loss is the weighted mean cross-entropy.
+        """
         print(f"Training behavioral cloning on {len(demo_data)} demo frames...")
         
         # Prepare data
         observations = np.array([d['observation'] for d in demo_data])
         actions = np.array([d['action'] for d in demo_data])
+        weights = np.array([d.get('weight', 1.0) for d in demo_data])
         
         # Convert to tensors
         obs_tensor = torch.FloatTensor(observations).to(self.device)
         action_tensor = torch.LongTensor(actions).to(self.device)
+        weight_tensor = torch.FloatTensor(weights).to(self.device)
         
         # Training loop
         for epoch in range(epochs):
@@ -99,17 +98,20 @@ class AsteroidDroidAgent:
             indices = torch.randperm(len(obs_tensor))
             obs_shuffled = obs_tensor[indices]
             action_shuffled = action_tensor[indices]
+            weight_shuffled = weight_tensor[indices]
             
             # Mini-batch training
             for i in range(0, len(obs_tensor), batch_size):
                 batch_obs = obs_shuffled[i:i+batch_size]
                 batch_actions = action_shuffled[i:i+batch_size]
+                batch_weights = weight_shuffled[i:i+batch_size]
                 
                 # Forward pass
                 action_logits, _ = self.policy_net(batch_obs)
                 
-                # Compute loss (cross-entropy)
-                loss = F.cross_entropy(action_logits, batch_actions)
+                # Compute loss (cross-entropy, weighted by frames each sample stands for)
+                per_sample_loss = F.cross_entropy(action_logits, batch_actions, reduction='none')
+                loss = (per_sample_loss * batch_weights).sum() / batch_weights.sum()
                 
                 # Backward pass
                 self.optimizer.zero_grad()
@@ -129,44 +131,65 @@ class AsteroidDroidAgent:
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         torch.save({
             'policy_net_state_dict': self.policy_net.state_dict(),
-            'obs_dim': self.obs_dim,
-            'action_dim': self.action_dim
+            **OBS_SCHEMA.describe()
         }, filepath)
         print(f"Model saved to {filepath}")
     
-    def save_onnx(self, filepath: str):
-        """Export model to ONNX format for JavaScript loading."""
-        self.policy_net.eval()
+    def load(self, filepath: str):
+        """Load model from file saved by save()."""
+        checkpoint = torch.load(filepath, map_location=self.device)
+        OBS_SCHEMA.check(checkpoint, filepath)
+        self.policy_net.load_state_dict(checkpoint['policy_net_state_dict'])
+        print(f"Model loaded from {filepath}")
+    
+    def save_onnx(self, filepath: str, report_latency: bool = True):
+        """Export model to ONNX format for JavaScript loading.
         
-        # Create dummy input
-        dummy_input = torch.randn(1, self.obs_dim).to(self.device)
+        The export is validated against PyTorch with ONNX Runtime, and
+        inference latency is reported unless report_latency is False.
+        """
+        from onnx_export import export_onnx, OnnxPolicy, benchmark_latency, print_latency_report
         
-        # Export to ONNX
-        torch.onnx.export(
-            self.policy_net,
-            dummy_input,
-            filepath,
-            input_names=['observation'],
-            output_names=['action_logits', 'value'],
-            dynamic_axes={
-                'observation': {0: 'batch_size'},
-                'action_logits': {0: 'batch_size'},
-                'value': {0: 'batch_size'}
-            },
-            opset_version=11
-        )
+        export_onnx(self.policy_net, filepath, self.obs_dim)
         print(f"ONNX model saved to {filepath}")
+        
+        if report_latency:
+            cpu_model = self.policy_net if self.device.type == 'cpu' else None
+            print_latency_report(benchmark_latency(OnnxPolicy(filepath), torch_model=cpu_model))
 
 
 def load_demo_data(filepath: str) -> List[Dict]:
-    """Load demo data from JSON file."""
+    """Load demo data from JSON file.
+    
+    Accepts either a bare list of frames or a dict with schema metadata and a
+    'frames' list (as written by save_demo_data). The observation schema is
+    checked before any training starts.
+    """
     with open(filepath, 'r') as f:
         data = json.load(f)
     
+    if isinstance(data, dict):
+        OBS_SCHEMA.check(data, filepath)
+        data = data['frames']
+    
+    bad_frames = [i for i, d in enumerate(data) if len(d['observation']) != OBS_DIM]
+    if bad_frames:
+        raise SchemaMismatchError(
+            f"{filepath}: {len(bad_frames)} frames do not have {OBS_DIM}-dim observations "
+            f"(first bad frame {bad_frames[0]} has {len(data[bad_frames[0]]['observation'])})"
+        )
+    
     print(f"Loaded {len(data)} demo frames from {filepath}")
     return data
 
 
+def save_demo_data(demo_data: List[Dict], filepath: str):
+    """Save demo frames to JSON file, stamped with the observation schema."""
+    with open(filepath, 'w') as f:
+        json.dump({**OBS_SCHEMA.describe(), 'frames': demo_data}, f)
+    print(f"Saved {len(demo_data)} demo frames to {filepath}")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Train Asteroid Droid RL Agent')
     parser.add_argument('--demo_file', type=str, required=True,
@@ -181,6 +204,14 @@ def main():
                        help='Output directory for saved models (default: models)')
     parser.add_argument('--device', type=str, default='cpu',
                        help='Device to use (cpu or cuda) (default: cpu)')
+    parser.add_argument('--no_subsample', action='store_true',
+                       help='Train on every recorded frame instead of collapsing near-duplicates')
+    parser.add_argument('--subsample_method', type=str, default='distance', choices=['distance', 'quantize'],
+                       help='Near-duplicate test: L-inf distance to the run start, or grid quantization (default: distance)')
+    parser.add_argument('--subsample_tolerance', type=float, default=0.02,
+                       help='Max L-inf distance from the run start (grid cell size with quantize) (default: 0.02)')
+    parser.add_argument('--subsample_max_run_length', type=int, default=60,
+                       help='Max frames collapsed into one sample, 0 = no limit (default: 60)')
     
     args = parser.parse_args()
     
@@ -191,6 +222,14 @@ def main():
         print("Error: No demo data found!")
         return
     
+    # Collapse runs of near-duplicate consecutive frames into weighted samples
+    if not args.no_subsample:
+        num_frames = len(demo_data)
+        demo_data = subsample_demo_data(demo_data, method=args.subsample_method,
+                                        tolerance=args.subsample_tolerance,
+                                        max_run_length=args.subsample_max_run_length)
+        print(f"Subsampled {num_frames} frames to {len(demo_data)} ({num_frames / len(demo_data):.1f}x reduction)")
+    
     # Initialize agent
     agent = AsteroidDroidAgent(OBS_DIM, NUM_ACTIONS, lr=args.lr, device=args.device)
     
@@ -0,0 +1,72 @@
+"""
+Weight list formats of PolicyNetwork model JSON files.
+
+Model files store the network as a list of {shape, dtype, data} entries in
+TensorFlow.js getWeights() order. Two layouts exist:
+
+    'torch' - pretrain_asteroid_droid.py exports, dense kernels [out, in]
+    'tfjs'  - game.js exportModelWeights() and learner_service.py saves,
+              dense kernels [in, out], marked with 'weights_layout': 'tfjs'
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import torch
+
+# State dict keys in TensorFlow.js getWeights() order
+TFJS_WEIGHT_ORDER = [
+    'shared.0.weight', 'shared.0.bias',
+    'shared.2.weight', 'shared.2.bias',
+    'shared.3.weight', 'shared.3.bias',
+    'shared.5.weight', 'shared.5.bias',
+    'policy_head.weight', 'policy_head.bias',
+    'value_head.weight', 'value_head.bias',
+]
+LINEAR_WEIGHTS = {'shared.0.weight', 'shared.3.weight', 'policy_head.weight', 'value_head.weight'}
+
+
+def weights_layout(data: Dict) -> str:
+    """Layout of the weights in a loaded model JSON file ('tfjs' or 'torch').
+
+    Learner saves written before the 'weights_layout' marker carry learner_version.
+    """
+    if data.get('weights_layout') == 'tfjs' or 'learner_version' in data:
+        return 'tfjs'
+    return 'torch'
+
+
+def state_dict_to_tfjs_weights(state_dict: Dict[str, torch.Tensor]) -> List[Dict]:
+    """Convert a PolicyNetwork state dict to the game.js weight list format."""
+    weights = []
+    for key in TFJS_WEIGHT_ORDER:
+        tensor = state_dict[key].detach().cpu()
+        if key in LINEAR_WEIGHTS:
+            tensor = tensor.t()  # PyTorch Linear is [out, in], TF.js dense kernel is [in, out]
+        weights.append({
+            'shape': list(tensor.shape),
+            'dtype': 'float32',
+            'data': tensor.contiguous().numpy().flatten().tolist()
+        })
+    return weights
+
+
+def weights_to_state_dict(weights: List[Dict], layout: str = 'tfjs') -> Dict[str, torch.Tensor]:
+    """Rebuild a PolicyNetwork state dict from a weight list in the given layout."""
+    if layout not in ('tfjs', 'torch'):
+        raise ValueError(f"Unknown weights layout '{layout}' (expected 'tfjs' or 'torch')")
+    if len(weights) != len(TFJS_WEIGHT_ORDER):
+        raise ValueError(f"Expected {len(TFJS_WEIGHT_ORDER)} weight tensors, found {len(weights)}")
+
+    state_dict = {}
+    for key, w in zip(TFJS_WEIGHT_ORDER, weights):
+        tensor = torch.FloatTensor(np.array(w['data'], dtype=np.float32).reshape(w['shape']))
+        if layout == 'tfjs' and key in LINEAR_WEIGHTS:
+            tensor = tensor.t().contiguous()
+        state_dict[key] = tensor
+    return state_dict
+
+
+def tfjs_weights_to_state_dict(weights: List[Dict]) -> Dict[str, torch.Tensor]:
+    """Inverse of state_dict_to_tfjs_weights."""
+    return weights_to_state_dict(weights, 'tfjs')